@@ -3,11 +3,187 @@ import os
 import json
 import base64
 import asyncio
+import functools
+import heapq
+import logging
+import time
+from contextlib import ExitStack
+from http.cookiejar import DefaultCookiePolicy
+from operator import methodcaller
 from typing import Dict, List, Union, Optional
 
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
 # 搜索相关常量
 SEARCH_MAX_RETRIES = 10
-SEARCH_RETRY_DELAY_SECONDS = 1.0
+# 轮询间隔按指数退避: 0.1s, 0.2s, 0.4s ... 最长2s
+SEARCH_RETRY_INITIAL_DELAY_SECONDS = 0.1
+SEARCH_RETRY_MAX_DELAY_SECONDS = 2.0
+# 已有结果但搜索仍在运行时，等待这么久后返回现有结果
+SEARCH_MIN_WAIT_SECONDS = 2.0
+# 等待超过这么久后，某次轮询没有新增结果即提前返回
+SEARCH_NO_GROWTH_MIN_WAIT_SECONDS = 0.5
+
+# Read buffer for torrent uploads, large enough to read a typical .torrent in one syscall
+TORRENT_READ_BUFFER_SIZE = 128 * 1024
+
+# Outbound limits for the WebUI, which serves requests from a single process
+WEBUI_MAX_CONCURRENCY = 8
+WEBUI_REQUESTS_PER_SECOND = 20
+WEBUI_BURST = 10
+
+# Request headers shared by all API calls
+_ACCEPT_HEADERS = {"Accept": "*/*"}
+_FORM_HEADERS = {
+    "Accept": "*/*",
+    "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"
+}
+_JSON_FORM_HEADERS = {
+    "Accept": "application/json",
+    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
+}
+
+# Shared connection pools, one per WebUI host
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+# Session cookies keyed by (host, username)
+_cookie_cache: Dict[tuple[str, str], httpx.Cookies] = {}
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for async callers
+
+    Tokens refill continuously at requests_per_second up to burst, each
+    acquire() takes one token and waits until one is available.
+    """
+
+    def __init__(self, requests_per_second: float, burst: int):
+        self.rate = requests_per_second
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+# Shared by every outbound request, see configure_limits()
+_gate = asyncio.Semaphore(WEBUI_MAX_CONCURRENCY)
+_bucket = TokenBucket(WEBUI_REQUESTS_PER_SECOND, WEBUI_BURST)
+
+def configure_limits(rps: float, concurrency: int, burst: Optional[int] = None) -> None:
+    """
+    Change the outbound request limits for the WebUI
+
+    Args:
+        rps: Maximum sustained requests per second
+        concurrency: Maximum number of requests in flight at the same time
+        burst: Maximum number of requests sent back to back, defaults to WEBUI_BURST
+    
+    Raises:
+        ValueError: If any limit is not positive
+    """
+    global _gate, _bucket
+    if burst is None:
+        burst = WEBUI_BURST
+    if rps <= 0:
+        raise ValueError(f"rps must be positive, got {rps}")
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    if burst < 1:
+        raise ValueError(f"burst must be at least 1, got {burst}")
+    _gate = asyncio.Semaphore(concurrency)
+    _bucket = TokenBucket(rps, burst)
+
+def _json_loads(data: Union[str, bytes]):
+    """
+    Parse JSON with orjson when installed, raises json.JSONDecodeError either way
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps_pretty(obj) -> str:
+    """
+    Serialize to indented JSON keeping non-ASCII characters, using orjson when installed
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def _join_ids(ids: Union[str, List[str]]) -> str:
+    """
+    Join a list of hashes or file ids with |, as the WebUI expects; strings pass through
+    """
+    if isinstance(ids, (list, tuple)):
+        return "|".join(map(str, ids))
+    return ids
+
+@functools.lru_cache(maxsize=16)
+def _netloc(host: str) -> str:
+    """
+    Strip the scheme from a host address, e.g. http://127.0.0.1:8080 -> 127.0.0.1:8080
+    """
+    return host.split("://", 1)[-1]
+
+async def get_client(host: str) -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client for a qBittorrent WebUI host
+
+    The client is created on first use and reused afterwards, so keep-alive
+    connections survive across API calls instead of reconnecting every time.
+
+    Args:
+        host: qBittorrent WebUI host address
+
+    Returns:
+        Pooled httpx.AsyncClient bound to the host
+    """
+    client = _clients.get(host)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=host,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+            # Multiplex concurrent calls over one connection when the WebUI
+            # negotiates h2 (HTTPS), otherwise httpx stays on HTTP/1.1
+            http2=True,
+            timeout=30.0
+        )
+        # Never store Set-Cookie on the shared client, sessions live in
+        # _cookie_cache per (host, username) and are sent explicitly
+        client.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        _clients[host] = client
+    return client
+
+async def aclose() -> None:
+    """
+    Close all shared HTTP clients, call once at shutdown
+    """
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+async def _send(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request within the shared concurrency and rate limits
+    """
+    async with _gate:
+        await _bucket.acquire()
+        return await client.request(method, url, **kwargs)
 
 async def login_to_qbittorrent(username, password, host):
     """
@@ -21,15 +197,73 @@ async def login_to_qbittorrent(username, password, host):
     Returns:
         Returns object containing session cookie on success, None on failure
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{host}/api/v2/auth/login",
-            data={"username": username, "password": password}
-        )
+    client = await get_client(host)
+    response = await _send(
+        client,
+        "POST",
+        f"{host}/api/v2/auth/login",
+        data={"username": username, "password": password}
+    )
     
-        if response.status_code == 200:
-            return response.cookies
-        return None
+    if response.status_code == 200:
+        return response.cookies
+    return None
+
+async def get_cookies(username, password, host, refresh: bool = False):
+    """
+    Get session cookie for a WebUI host, logging in only when none is cached
+
+    Args:
+        username: Username
+        password: Password
+        host: qBittorrent WebUI host address
+        refresh: If True, drop the cached cookie and login again
+
+    Returns:
+        Returns object containing session cookie on success, None on failure
+    """
+    key = (host, username)
+    if not refresh and key in _cookie_cache:
+        return _cookie_cache[key]
+
+    _cookie_cache.pop(key, None)
+    cookies = await login_to_qbittorrent(username, password, host)
+    if cookies:
+        _cookie_cache[key] = cookies
+    return cookies
+
+def _with_session(headers, cookies) -> Dict[str, str]:
+    """
+    Copy request headers and add a Cookie header carrying the session cookie
+    """
+    session = "; ".join(f"{name}={value}" for name, value in (cookies or {}).items())
+    return {**headers, "Cookie": session} if session else dict(headers)
+
+async def _authed_request(method: str, url: str, username, password, host, **kwargs) -> httpx.Response:
+    """
+    Send a request with the cached session cookie, re-login once if the session expired
+
+    Args:
+        method: HTTP method
+        url: Request URL
+        username: Username
+        password: Password
+        host: qBittorrent WebUI host address
+        **kwargs: Extra arguments passed to httpx.AsyncClient.request
+
+    Returns:
+        Response of the request
+    """
+    client = await get_client(host)
+    headers = kwargs.pop("headers", None) or {}
+    cookies = await get_cookies(username, password, host)
+    response = await _send(client, method, url, headers=_with_session(headers, cookies), **kwargs)
+
+    if response.status_code in (401, 403):
+        cookies = await get_cookies(username, password, host, refresh=True)
+        if cookies:
+            response = await _send(client, method, url, headers=_with_session(headers, cookies), **kwargs)
+    return response
 
 async def add_torrent_api(query: str, host: str, username: str, password: str) -> str:
     """
@@ -44,68 +278,92 @@ async def add_torrent_api(query: str, host: str, username: str, password: str) -
     Returns:
         Status and message of the add operation
     """
-    # Debug log, write to file
-    with open("qbittorrent_debug.log", "a") as f:
-        f.write(f"Received query: {query}\n")
+    logger.debug("Received query: %s", query)
     
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     
     try:
-        try:
-            data = json.loads(query)
-        except json.JSONDecodeError:
+        # Only a JSON array or object is accepted, so skip parsing plain paths
+        data = None
+        if query.lstrip()[:1] in ('[', '{'):
+            try:
+                data = _json_loads(query)
+            except json.JSONDecodeError:
+                # Paths like "[Group] name.torrent" start with a bracket too
+                pass
+        
+        if data is None:
             # If not valid JSON, assume single file path
             file_paths = [query.strip()]
+        # JSON parsing succeeded, determine result type
+        elif isinstance(data, list):
+            file_paths = data
+        elif isinstance(data, dict) and "file_paths" in data:
+            file_paths = data["file_paths"]
         else:
-            # JSON parsing succeeded, determine result type
-            if isinstance(data, list):
-                file_paths = data
-            elif isinstance(data, dict) and "file_paths" in data:
-                file_paths = data["file_paths"]
-            else:
-                return "Error: JSON format not recognized, please provide required format"
+            return "Error: JSON format not recognized, please provide required format"
             
         if not file_paths:
             return "Error: No torrent file path provided"
         
-        results = []
-        async with httpx.AsyncClient() as client:
+        # Collect every readable file into one multipart request, qBittorrent
+        # accepts repeated "torrents" parts; results keep the input order
+        results: List[Optional[str]] = []
+        pending = []
+        with ExitStack() as stack:
+            files = []
             for file_path in file_paths:
-                if not os.path.exists(file_path):
+                # httpx streams the handle in chunks with plain sync reads on
+                # the event loop; .torrent files are small, so open directly
+                # rather than paying a thread hop per file
+                try:
+                    f = stack.enter_context(open(file_path, 'rb', buffering=TORRENT_READ_BUFFER_SIZE))
+                except FileNotFoundError:
                     results.append(f"File does not exist: {file_path}")
                     continue
-                
-                files = {}
-                try:
-                    with open(file_path, 'rb') as f:
-                        file_content = f.read()
-                        file_name = os.path.basename(file_path)
-                        files = {'torrents': (file_name, file_content, 'application/x-bittorrent')}
-                except Exception as e:
+                except OSError as e:
                     results.append(f"Error reading file {file_path}: {str(e)}")
                     continue
                 
+                file_name = os.path.basename(file_path)
+                # The WebUI keys uploaded parts by filename, so prefix the part
+                # index to keep same-named files from different folders apart;
+                # the torrent name itself comes from the metadata
+                part_name = f"{len(files)}_{file_name}"
+                files.append(('torrents', (part_name, f, 'application/x-bittorrent')))
+                pending.append((len(results), file_name))
+                results.append(None)
+            
+            if files:
                 # Explicitly set HTTP request headers
-                headers = {
-                    "Accept": "*/*",
-                    "Host": host.replace('http://', '').replace('https://', '')
-                }
+                headers = {**_ACCEPT_HEADERS, "Host": _netloc(host)}
                 
-                response = await client.post(
+                response = await _authed_request(
+                    "POST",
                     f"{host}/api/v2/torrents/add",
+                    username, password, host,
                     files=files,
-                    cookies=cookies,
                     headers=headers
                 )
                 
                 if response.status_code == 200:
-                    results.append(f"Successfully added torrent file: {file_name}")
-                elif response.status_code == 415:
-                    results.append(f"Invalid torrent file: {file_name}")
+                    for index, file_name in pending:
+                        results[index] = f"Successfully added torrent file: {file_name}"
                 else:
-                    results.append(f"Failed to add torrent file {file_name}: status code {response.status_code}")
+                    # The status covers the whole request, so report it once
+                    # instead of guessing which file the server rejected
+                    file_names = ", ".join(file_name for _, file_name in pending)
+                    results = [result for result in results if result is not None]
+                    if len(pending) == 1 and response.status_code == 415:
+                        results.append(f"Invalid torrent file: {file_names}")
+                    elif len(pending) == 1:
+                        results.append(f"Failed to add torrent file {file_names}: status code {response.status_code}")
+                    elif response.status_code == 415:
+                        results.append(f"Invalid torrent file among: {file_names}")
+                    else:
+                        results.append(f"Failed to add torrent files {file_names}: status code {response.status_code}")
         
         return "\n".join(results)
     except json.JSONDecodeError:
@@ -127,7 +385,7 @@ async def delete_torrent_api(hashes: str, delete_files: bool = False, host: str
     Returns:
         Result message of delete operation
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     
@@ -135,37 +393,34 @@ async def delete_torrent_api(hashes: str, delete_files: bool = False, host: str
         # Prepare form data
         data = {
             "hashes": hashes,
-            "deleteFiles": str(delete_files).lower()
+            "deleteFiles": "true" if delete_files else "false"
         }
         
         # Set correct Content-Type header
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"
-        }
+        headers = _FORM_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            # Use data parameter instead of json parameter
-            response = await client.post(
-                f"{host}/api/v2/torrents/delete",
-                data=data,  # Use data instead of json
-                cookies=cookies,
-                headers=headers
-            )
+        # Use data parameter instead of json parameter
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/delete",
+            username, password, host,
+            data=data,  # Use data instead of json
+            headers=headers
+        )
             
-            if response.status_code == 200:
-                if hashes == "all":
-                    return "Successfully deleted all torrents"
-                else:
-                    return f"Successfully deleted specified torrent: {hashes}"
+        if response.status_code == 200:
+            if hashes == "all":
+                return "Successfully deleted all torrents"
             else:
-                # Error handling
-                print(f"Failed to delete torrent, HTTP status code: {response.status_code}")
-                print(f"Response body: {response.text}")
-                try:
-                    return f"Failed to delete torrent, HTTP status code: {response.status_code}, response body: {response.json()}"
-                except:
-                    return f"Failed to delete torrent, HTTP status code: {response.status_code}, response body: {response.text}"
+                return f"Successfully deleted specified torrent: {hashes}"
+        else:
+            # Error handling
+            print(f"Failed to delete torrent, HTTP status code: {response.status_code}")
+            print(f"Response body: {response.text}")
+            try:
+                return f"Failed to delete torrent, HTTP status code: {response.status_code}, response body: {response.json()}"
+            except:
+                return f"Failed to delete torrent, HTTP status code: {response.status_code}, response body: {response.text}"
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -182,34 +437,31 @@ async def pause_torrent_api(hashes: str, host: str = '', username: str = '', pas
     Returns:
         Result message of pause operation
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     
     try:
         params = {"hashes": hashes}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"
-        }
+        headers = _FORM_HEADERS
         
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/torrents/stop",
-                data=params,
-                cookies=cookies,
-                headers=headers
-            )
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/stop",
+            username, password, host,
+            data=params,
+            headers=headers
+        )
             
-            if response.status_code == 200:
-                if hashes == "all":
-                    return "Successfully paused all torrents"
-                else:
-                    return f"Successfully paused specified torrent: {hashes}"
+        if response.status_code == 200:
+            if hashes == "all":
+                return "Successfully paused all torrents"
             else:
-                return f"Failed to pause torrent: status code {response.status_code}"
+                return f"Successfully paused specified torrent: {hashes}"
+        else:
+            return f"Failed to pause torrent: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -226,33 +478,30 @@ async def resume_torrent_api(hashes: str, host: str = '', username: str = '', pa
     Returns:
         Result message of resume operation
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     
     try:
         params = {"hashes": hashes}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"
-        }
+        headers = _FORM_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/torrents/start",
-                data=params,
-                cookies=cookies,
-                headers=headers
-            )
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/start",
+            username, password, host,
+            data=params,
+            headers=headers
+        )
             
-            if response.status_code == 200:
-                if hashes == "all":
-                    return "Successfully resumed all torrents"
-                else:
-                    return f"Successfully resumed specified torrent: {hashes}"
+        if response.status_code == 200:
+            if hashes == "all":
+                return "Successfully resumed all torrents"
             else:
-                return f"Failed to resume torrent: status code {response.status_code}"
+                return f"Successfully resumed specified torrent: {hashes}"
+        else:
+            return f"Failed to resume torrent: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}" 
     
@@ -269,51 +518,43 @@ async def get_torrent_trackers_urls(hash: str, host: str = '', username: str = '
     Returns:
         Formatted string containing torrent trackers
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
         params = {"hash": hash}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"
-        }
+        headers = _FORM_HEADERS
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{host}/api/v2/torrents/trackers",
-                    params=params,
-                    cookies=cookies,
-                    headers=headers
-                )
-            except Exception as e:
-                return f"Error: {str(e)}"
+        try:
+            response = await _authed_request(
+                "GET",
+                f"{host}/api/v2/torrents/trackers",
+                username, password, host,
+                params=params,
+                headers=headers
+            )
+        except Exception as e:
+            return f"Error: {str(e)}"
             
-            if response.status_code == 200:
+        if response.status_code == 200:
 
-                trackers = response.json()
-                if not trackers:
-                    return "This torrent has no trackers"
+            trackers = response.json()
+            if not trackers:
+                return "This torrent has no trackers"
                 
-                # Extract all URLs
-                tracker_urls = []
-                for tracker in trackers:
-                    url = tracker.get('url')
-                    status = tracker.get('status')
-                    msg = tracker.get('msg')
-                    
-                    # Exclude DHT, PeX, LSD and other special trackers, only get actual URLs
-                    if not url.startswith('** ['):
-                        tracker_urls.append(f"{url}")
+            # Extract all URLs, excluding DHT, PeX, LSD and other special trackers
+            tracker_urls = [
+                url for tracker in trackers
+                if (url := tracker.get('url')) and not url.startswith('** [')
+            ]
                 
-                if not tracker_urls:
-                    return "This torrent has no valid tracker URLs"
+            if not tracker_urls:
+                return "This torrent has no valid tracker URLs"
                 
-                return ",".join(tracker_urls)
-            else:
-                return f"Failed to get torrent trackers: status code {response.status_code}"
+            return ",".join(tracker_urls)
+        else:
+            return f"Failed to get torrent trackers: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}"
     
@@ -330,29 +571,26 @@ async def set_global_download_limit_api(limit: int, host: str = '', username: st
     Returns:
         Result message of setting speed limit
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
         params = {"limit": limit}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"
-        }
+        headers = _FORM_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/transfer/setDownloadLimit",
-                data=params,
-                cookies=cookies,
-                headers=headers
-            )
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/transfer/setDownloadLimit",
+            username, password, host,
+            data=params,
+            headers=headers
+        )
             
-            if response.status_code == 200:
-                return f"Successfully set speed limit: {limit}"
-            else:
-                return f"Failed to set speed limit: status code {response.status_code}"
+        if response.status_code == 200:
+            return f"Successfully set speed limit: {limit}"
+        else:
+            return f"Failed to set speed limit: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}" 
     
@@ -369,27 +607,24 @@ async def set_global_upload_limit_api(limit: int, host: str = '', username: str
     Returns:
         Result message of setting speed limit
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
         params = {"limit": limit}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"
-        }
+        headers = _FORM_HEADERS
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/transfer/setUploadLimit",
-                data=params,
-                cookies=cookies,
-                headers=headers)
-            if response.status_code == 200:
-                return f"Successfully set speed limit: {limit}"
-            else:
-                return f"Failed to set speed limit: status code {response.status_code}"
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/transfer/setUploadLimit",
+            username, password, host,
+            data=params,
+            headers=headers)
+        if response.status_code == 200:
+            return f"Successfully set speed limit: {limit}"
+        else:
+            return f"Failed to set speed limit: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}" 
     
@@ -400,34 +635,33 @@ async def get_application_version_api(host: str = '', username: str = '', passwo
     Returns:
         qBittorrent version
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
-        headers = {
-            "Accept": "*/*",
-        }
+        headers = _ACCEPT_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{host}/api/v2/app/version",
-                cookies=cookies,
-                headers=headers
-            )
-            if response.status_code == 200:
-                return response.text.strip()
-            else:
-                return f"Failed to get qBittorrent version: status code {response.status_code}"
+        response = await _authed_request(
+            "GET",
+            f"{host}/api/v2/app/version",
+            username, password, host,
+            headers=headers
+        )
+        if response.status_code == 200:
+            return response.text.strip()
+        else:
+            return f"Failed to get qBittorrent version: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}" 
     
-async def set_file_priority_api(hash: str, id: str, priority: int, host: str = '', username: str = '', password: str = '') -> str:
+async def set_file_priority_api(hash: str, id: Union[str, List[str]], priority: int, host: str = '', username: str = '', password: str = '') -> str:
     """
     Set file priority
     
     Args:
         hash: Torrent hash value
         id: correspond to file position inside the array returned by torrent contents API, e.g. id=0 for first file, id=1 for second file, etc.
+            Multiple ids separated by |, or a list of ids, are set in one request
         priority: 
         Value	Description
         0	Do not download
@@ -445,35 +679,51 @@ async def set_file_priority_api(hash: str, id: str, priority: int, host: str = '
         409	At least one file id was not found
         200	All other scenarios
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
+        id = _join_ids(id)
         params = {"hash": hash, "id": id, "priority": priority}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded;charset=UTF-8"}
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/torrents/filePrio",
-                data=params,
-                cookies=cookies,
-                headers=headers)
-            if response.status_code == 200:
-                return f"Successfully set file priority: {hash}:{id}:{priority}"
-            else:
-                return f"Failed to set file priority: status code {response.status_code}"
+        headers = _FORM_HEADERS
+        
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/filePrio",
+            username, password, host,
+            data=params,
+            headers=headers)
+        if response.status_code == 200:
+            return f"Successfully set file priority: {hash}:{id}:{priority}"
+        else:
+            return f"Failed to set file priority: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}"
 
-async def set_torrent_download_limit_api(hash: str, limit: int, host: str = '', username: str = '', password: str = '') -> str:
+async def set_file_priorities_api(hash: str, ids: List[str], priority: int, host: str = '', username: str = '', password: str = '') -> str:
     """
-    Set torrent download speed limit
+    Set the same priority for several files of a torrent in one request
     
     Args:
         hash: Torrent hash value
+        ids: File positions inside the array returned by torrent contents API
+        priority: Priority value, see set_file_priority_api
+        host: qBittorrent WebUI host address
+        username: Username
+        password: Password
+        
+    Returns:
+        Result message of setting file priority
+    """
+    return await set_file_priority_api(hash, ids, priority, host, username, password)
+
+async def set_torrent_download_limit_api(hash: Union[str, List[str]], limit: int, host: str = '', username: str = '', password: str = '') -> str:
+    """
+    Set torrent download speed limit
+    
+    Args:
+        hash: Torrent hash value, multiple hashes separated by | or as a list are set in one request
         limit: Speed limit value, in bytes/second
         host: qBittorrent WebUI host address
         username: Username
@@ -482,37 +732,35 @@ async def set_torrent_download_limit_api(hash: str, limit: int, host: str = '',
     Returns:
         Result message of setting torrent download speed limit
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
+        hash = _join_ids(hash)
         params = {"hashes": hash, "limit": limit}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
+        headers = _FORM_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/torrents/setDownloadLimit",
-                data=params,
-                cookies=cookies,
-                headers=headers)
-            if response.status_code == 200:
-                return f"Successfully set torrent download speed limit: {hash}:{limit}"
-            else:
-                return f"Failed to set torrent download speed limit: status code {response.status_code}"
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/setDownloadLimit",
+            username, password, host,
+            data=params,
+            headers=headers)
+        if response.status_code == 200:
+            return f"Successfully set torrent download speed limit: {hash}:{limit}"
+        else:
+            return f"Failed to set torrent download speed limit: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}"
     
 
-async def set_torrent_upload_limit_api(hash: str, limit: int, host: str = '', username: str = '', password: str = '') -> str:
+async def set_torrent_upload_limit_api(hash: Union[str, List[str]], limit: int, host: str = '', username: str = '', password: str = '') -> str:
     """
     Set torrent upload speed limit
     
     Args:
-        hash: Torrent hash value
+        hash: Torrent hash value, multiple hashes separated by | or as a list are set in one request
         limit: Speed limit value, in bytes/second
         host: qBittorrent WebUI host address
         username: Username
@@ -521,27 +769,25 @@ async def set_torrent_upload_limit_api(hash: str, limit: int, host: str = '', us
     Returns:
         Result message of setting torrent upload speed limit
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
+        hash = _join_ids(hash)
         params = {"hashes": hash, "limit": limit}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
+        headers = _FORM_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/torrents/setUploadLimit",
-                data=params,
-                cookies=cookies,
-                headers=headers)
-            if response.status_code == 200:
-                return f"Successfully set torrent upload speed limit: {hash}:{limit}"
-            else:
-                return f"Failed to set torrent upload speed limit: status code {response.status_code}"
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/setUploadLimit",
+            username, password, host,
+            data=params,
+            headers=headers)
+        if response.status_code == 200:
+            return f"Successfully set torrent upload speed limit: {hash}:{limit}"
+        else:
+            return f"Failed to set torrent upload speed limit: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}" 
 
@@ -562,27 +808,24 @@ async def add_trackers_to_torrent_api(hash: str, trackers: str, host: str = '',
     Returns:
         Result message of adding trackers
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
         params = {"hash": hash, "urls": trackers}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
+        headers = _FORM_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/torrents/addTrackers",
-                data=params,
-                cookies=cookies,
-                headers=headers)
-            if response.status_code == 200:
-                return f"Successfully added trackers: {hash}:{trackers}"
-            else:
-                return f"Failed to add trackers: status code {response.status_code}"
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/addTrackers",
+            username, password, host,
+            data=params,
+            headers=headers)
+        if response.status_code == 200:
+            return f"Successfully added trackers: {hash}:{trackers}"
+        else:
+            return f"Failed to add trackers: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -603,27 +846,24 @@ async def add_torrent_tags_api(hash: str, tags: str, host: str = '', username: s
     Returns:
         Result message of adding torrent tags
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
         params = {"hashes": hash, "tags": tags}
         
-        headers = {
-            "Accept": "*/*",
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
+        headers = _FORM_HEADERS
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{host}/api/v2/torrents/addTags",
-                data=params,
-                cookies=cookies,
-                headers=headers)
-            if response.status_code == 200:
-                return f"Successfully added torrent tags: {hash}:{tags}"
-            else:
-                return f"Failed to add torrent tags: status code {response.status_code}"
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/torrents/addTags",
+            username, password, host,
+            data=params,
+            headers=headers)
+        if response.status_code == 200:
+            return f"Successfully added torrent tags: {hash}:{tags}"
+        else:
+            return f"Failed to add torrent tags: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -631,24 +871,22 @@ async def get_torrent_list_api(host: str = '', username: str = '', password: str
     """
     Get torrent list
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return "Login failed, unable to get SID"
     try:
-        headers = {
-            "Accept": "*/*",
-        }
+        headers = _ACCEPT_HEADERS
         
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{host}/api/v2/torrents/info",
-                cookies=cookies,
-                headers=headers)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return f"Failed to get torrent list: status code {response.status_code}"
+        response = await _authed_request(
+            "GET",
+            f"{host}/api/v2/torrents/info",
+            username, password, host,
+            headers=headers)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return f"Failed to get torrent list: status code {response.status_code}"
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -671,8 +909,8 @@ async def search_torrents_api(
         category: 搜索类别 (all, movies, anime, books, tv, software等)，默认为all
         plugins: 搜索插件 (all或特定插件)，默认为all
         max_size_gb: 最大文件大小限制(GB)，默认为5GB
-        limit: 内部参数，控制API返回的结果数量，默认为100
-        offset: 内部参数，控制结果偏移量，默认为0
+        limit: 内部参数，控制最多获取的结果数量，默认为100，轮询时只获取新增的结果
+        offset: 内部参数，控制结果偏移量，默认为0，负数表示只取末尾的-offset个结果
         host: qBittorrent WebUI主机地址
         username: 用户名
         password: 密码
@@ -680,15 +918,12 @@ async def search_torrents_api(
     Returns:
         搜索结果的JSON字符串，包含过滤和排序后的top 10结果
     """
-    cookies = await login_to_qbittorrent(username, password, host)
+    cookies = await get_cookies(username, password, host)
     if not cookies:
         return json.dumps({"error": "登录失败，无法获取SID"})
     
     try:
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
-        }
+        headers = _JSON_FORM_HEADERS
         
         # Step 1: 启动搜索
         search_data = {
@@ -697,103 +932,140 @@ async def search_torrents_api(
             "plugins": plugins
         }
         
-        async with httpx.AsyncClient() as client:
-            # 启动搜索
-            response = await client.post(
-                f"{host}/api/v2/search/start",
-                data=search_data,
-                cookies=cookies,
-                headers=headers
-            )
+        # 启动搜索
+        response = await _authed_request(
+            "POST",
+            f"{host}/api/v2/search/start",
+            username, password, host,
+            data=search_data,
+            headers=headers
+        )
             
-            if response.status_code != 200:
-                return json.dumps({
-                    "error": f"启动搜索失败: 状态码 {response.status_code}",
-                    "response": response.text
-                })
+        if response.status_code != 200:
+            return json.dumps({
+                "error": f"启动搜索失败: 状态码 {response.status_code}",
+                "response": response.text
+            })
             
-            # 获取搜索ID
-            search_result = response.json()
-            search_id = search_result.get('id')
+        # 获取搜索ID
+        search_result = _json_loads(response.content)
+        search_id = search_result.get('id')
             
-            if not search_id:
-                return json.dumps({
-                    "error": "未能获取搜索ID",
-                    "response": search_result
-                })
+        if not search_id:
+            return json.dumps({
+                "error": "未能获取搜索ID",
+                "response": search_result
+            })
             
-            # Step 2: 轮询获取搜索结果，带超时机制
-            torrents = []
-            status = None
+        # Step 2: 轮询获取搜索结果，带超时机制
+        torrents = []
+        status = None
+        waited = 0.0
+        total = 0
             
-            for attempt in range(SEARCH_MAX_RETRIES):
+        for attempt in range(SEARCH_MAX_RETRIES):
+            if offset < 0:
+                # 负偏移量表示取末尾的结果，窗口随新结果移动，每次重新获取整个窗口
                 results_data = {
                     "id": search_id,
                     "limit": limit,
                     "offset": offset
                 }
+            else:
+                # 每次只获取上次轮询之后新增的结果，已获取的结果不重复传输
+                results_data = {
+                    "id": search_id,
+                    "limit": limit - len(torrents) if limit > 0 else limit,
+                    "offset": offset + len(torrents)
+                }
                 
-                response = await client.post(
-                    f"{host}/api/v2/search/results",
-                    data=results_data,
-                    cookies=cookies,
-                    headers=headers
-                )
+            response = await _authed_request(
+                "POST",
+                f"{host}/api/v2/search/results",
+                username, password, host,
+                data=results_data,
+                headers=headers
+            )
                 
-                if response.status_code != 200:
-                    return json.dumps({
-                        "error": f"获取搜索结果失败: 状态码 {response.status_code}",
-                        "response": response.text
-                    })
+            if response.status_code != 200:
+                return json.dumps({
+                    "error": f"获取搜索结果失败: 状态码 {response.status_code}",
+                    "response": response.text
+                })
                 
-                results = response.json()
-                status = results.get('status')
-                torrents = results.get('results', [])
+            results = _json_loads(response.content)
+            status = results.get('status')
+            batch = results.get('results', [])
+            if offset < 0:
+                torrents = batch
+                grew = results.get('total', 0) > total
+                total = results.get('total', 0)
+            else:
+                torrents.extend(batch)
+                grew = bool(batch)
                 
-                # 如果搜索完成，跳出循环
-                if status == 'Stopped':
-                    break
+            # 如果搜索完成，跳出循环
+            if status == 'Stopped':
+                break
                 
-                # 如果已有结果且已经尝试多次，返回现有结果
-                if torrents and attempt >= 2:
-                    break
+            # 结果数已达到limit，继续轮询也不会有更多结果
+            if limit > 0 and len(torrents) >= limit:
+                break
                 
-                # 如果还在运行，等待后重试
-                if attempt < SEARCH_MAX_RETRIES - 1:
-                    await asyncio.sleep(SEARCH_RETRY_DELAY_SECONDS)
-            
-            # 检查是否获取到结果
-            if not torrents and status != 'Stopped':
-                return json.dumps({
-                    "error": "搜索超时，未能获取到结果",
-                    "search_id": search_id,
-                    "status": status
-                })
+            # 两次轮询之间没有新增结果，返回现有结果；
+            # 退避初期间隔很短，过早判断会漏掉稍后到达的结果
+            if torrents and not grew and waited >= SEARCH_NO_GROWTH_MIN_WAIT_SECONDS:
+                break
+                
+            # 如果已有结果且已经等待足够久，返回现有结果
+            if torrents and waited >= SEARCH_MIN_WAIT_SECONDS:
+                break
+                
+            # 如果还在运行，按指数退避等待后重试
+            if attempt < SEARCH_MAX_RETRIES - 1:
+                delay = min(
+                    SEARCH_RETRY_MAX_DELAY_SECONDS,
+                    SEARCH_RETRY_INITIAL_DELAY_SECONDS * (2 ** attempt)
+                )
+                # 已有结果时不越过最长等待时间
+                if torrents:
+                    delay = min(delay, SEARCH_MIN_WAIT_SECONDS - waited)
+                await asyncio.sleep(delay)
+                waited += delay
             
-            # Step 3: 过滤大于max_size_gb的文件
-            max_size_bytes = max_size_gb * 1024 * 1024 * 1024  # 转换为字节
-            filtered_torrents = [
-                torrent for torrent in torrents 
-                if torrent.get('fileSize', 0) <= max_size_bytes
-            ]
+        # 检查是否获取到结果
+        if not torrents and status != 'Stopped':
+            return json.dumps({
+                "error": "搜索超时，未能获取到结果",
+                "search_id": search_id,
+                "status": status
+            })
             
-            # Step 4: 按nbSeeders降序排序
-            sorted_torrents = sorted(
-                filtered_torrents,
-                key=lambda x: x.get('nbSeeders', 0),
-                reverse=True
-            )
+        # Step 3: 过滤大于max_size_gb的文件
+        max_size_bytes = int(max_size_gb * (1 << 30))  # 转换为字节
+        # methodcaller在C层调用dict.get，缺失字段按0处理
+        get_size = methodcaller('get', 'fileSize', 0)
+        get_seeds = methodcaller('get', 'nbSeeders', 0)
+        filtered_count = 0
+        
+        def within_size():
+            # 单次遍历：过滤的同时统计数量
+            nonlocal filtered_count
+            for torrent in torrents:
+                if get_size(torrent) <= max_size_bytes:
+                    filtered_count += 1
+                    yield torrent
             
-            # Step 5: 返回top 10
-            top_10 = sorted_torrents[:10]
+        # Step 4: 按nbSeeders降序取top 10，无需对全部结果排序
+        top_10 = heapq.nlargest(10, within_size(), key=get_seeds)
             
-            return json.dumps({
-                "search_id": search_id,
-                "pattern": pattern,
-                "total_results": len(torrents),
-                "filtered_results": len(filtered_torrents),
-                "results": top_10
-            }, ensure_ascii=False, indent=2)
+        return _json_dumps_pretty({
+            "search_id": search_id,
+            "pattern": pattern,
+            "total_results": len(torrents),
+            "filtered_results": filtered_count,
+            "results": top_10
+        })
             
     except Exception as e:
         return json.dumps({
@@ -4,7 +4,9 @@ import base64
 import os
 import json
 import uuid
+from contextlib import asynccontextmanager
 from api import (
+    aclose,
     login_to_qbittorrent,
     add_torrent_api,
     delete_torrent_api,
@@ -15,6 +17,7 @@ from api import (
     set_global_upload_limit_api,
     get_application_version_api,
     set_file_priority_api,
+    set_file_priorities_api,
     set_torrent_download_limit_api,
     set_torrent_upload_limit_api,
     add_trackers_to_torrent_api,
@@ -28,8 +31,18 @@ DEFAULT_HOST = 'http://127.0.0.1:8080'
 DEFAULT_USERNAME = 'admin'
 DEFAULT_PASSWORD = 'adminadmin'
 
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """
+    Close pooled WebUI connections when the server shuts down
+    """
+    try:
+        yield
+    finally:
+        await aclose()
+
 # Initialize FastMCP server
-app = FastMCP('qbittorrent')
+app = FastMCP('qbittorrent', lifespan=lifespan)
 
 @app.tool()
 async def add_torrent(query: str) -> str:
@@ -163,6 +176,21 @@ async def set_file_priority(hash: str, id: str, priority: int) -> str:
     """ 
     return await set_file_priority_api(hash, id, priority, DEFAULT_HOST, DEFAULT_USERNAME, DEFAULT_PASSWORD)
 
+@app.tool()
+async def set_file_priorities(hash: str, ids: list[str], priority: int) -> str:
+    """
+    Set the same priority for several files of a torrent in one request
+    
+    Args:
+        hash: Torrent hash value
+        ids: File positions inside the array returned by torrent contents API, e.g. ["0", "2", "3"]
+        priority: 0 Do not download, 1 Normal priority, 6 High priority, 7 Maximal priority
+        
+    Returns:
+        Result message of setting file priority
+    """
+    return await set_file_priorities_api(hash, ids, priority, DEFAULT_HOST, DEFAULT_USERNAME, DEFAULT_PASSWORD)
+
 @app.tool()
 async def set_torrent_download_limit(hash: str, limit: int) -> str:
     """